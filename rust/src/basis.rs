@@ -1,6 +1,7 @@
 use pyo3::pyclass;
 use pyo3::pymethods;
-use crate::Vec2D;
+use crate::{MavDACError, Result, Vec2D};
+use rayon::prelude::*;
 use std::f64::consts::PI;
 
 /// Trait that allows standard evaluation of distortion functions 
@@ -23,6 +24,16 @@ pub trait DistortionBasis {
     }
 }
 
+/// batched methods take separate x and y vectors, which must be paired up
+fn check_batch_lengths(x: &[f64], y: &[f64]) -> Result<()> {
+    if x.len() != y.len() {
+        return Err(MavDACError::Coordinate(
+            format!("x and y have different lengths: {} != {}", x.len(), y.len())
+        ));
+    }
+    Ok(())
+}
+
 /// Bivariate Homogenous Polynomial to be used as distortion basis function
 /// 
 /// See [wikipedia article](https://en.wikipedia.org/wiki/Homogeneous_polynomial) for
@@ -65,12 +76,37 @@ impl BiVarPolyDistortions {
         self.sample(&Vec2D{x,y}, ell)
     }
 
+    /// sample all basis functions at many x/y coordinates in a single call,
+    /// returning a `[len(x), ncoeffs]` array
+    pub fn sample_xy_batch(&self, x: Vec<f64>, y: Vec<f64>) -> Result<Vec<Vec<f64>>> {
+        check_batch_lengths(&x, &y)?;
+        Ok(
+            x.into_par_iter().zip(y)
+            .map(|(x,y)| self.sample_all(&Vec2D{x,y}))
+            .collect()
+        )
+    }
+
     /// evaluate distortions (including coefficients) at x/y coordinates
     pub fn eval_xy(&self, x: f64, y: f64) -> (f64,f64) {
         let Vec2D{x,y} = self.eval(&Vec2D{x,y});
         (x,y)
     }
 
+    /// evaluate distortions (including coefficients) at many x/y coordinates
+    /// in a single call, returning a `[len(x), 2]` array
+    pub fn eval_xy_batch(&self, x: Vec<f64>, y: Vec<f64>) -> Result<Vec<(f64,f64)>> {
+        check_batch_lengths(&x, &y)?;
+        Ok(
+            x.into_par_iter().zip(y)
+            .map(|(x,y)| {
+                let Vec2D{x,y} = self.eval(&Vec2D{x,y});
+                (x,y)
+            })
+            .collect()
+        )
+    }
+
     #[getter]
     fn ncoeffs(&self) -> usize {
         self.coeffs.len()
@@ -95,6 +131,25 @@ impl BiVarPolyDistortions {
     }
 }
 
+impl BiVarPolyDistortions {
+    /// sample every basis function at a single position, building the powers
+    /// of x and y once and sharing them between all of the monomials
+    fn sample_all(&self, pos: &Vec2D) -> Vec<f64> {
+        let Vec2D{mut x, mut y} = pos;
+        x -= (self.shape[1] as f64)/2.0;
+        y -= (self.shape[0] as f64)/2.0;
+        x /= self.shape[1] as f64;
+        y /= self.shape[0] as f64;
+        let mut px = vec![1.0; self.degree+1];
+        let mut py = vec![1.0; self.degree+1];
+        for a in 1..=self.degree {
+            px[a] = px[a-1]*x;
+            py[a] = py[a-1]*y;
+        }
+        self.nk_lut.iter().map(|&(n,k)| px[k]*py[n-k]).collect()
+    }
+}
+
 impl DistortionBasis for BiVarPolyDistortions {
     fn sample(&self, pos: &Vec2D, index: usize) -> f64 {
         let (n,k) = self.nk_lut[index];
@@ -103,7 +158,14 @@ impl DistortionBasis for BiVarPolyDistortions {
         y -= (self.shape[0] as f64)/2.0;
         x /= self.shape[1] as f64;
         y /= self.shape[0] as f64;
-        x.powf(k as f64)*y.powf((n-k) as f64)
+        x.powi(k as i32)*y.powi((n-k) as i32)
+    }
+
+    fn eval(&self, pos: &Vec2D) -> Vec2D {
+        // build the powers of x and y once, rather than once per coefficient
+        self.sample_all(pos).into_iter().zip(&self.coeffs)
+        .map(|(f, coeff)| *coeff * f)
+        .fold(Vec2D{x:0.0,y:0.0}, |a,b| a+b)
     }
     
     fn get_coeffs(&self) -> &Vec<Vec2D> {
@@ -145,12 +207,40 @@ impl BiVarFourierDistortions {
         self.sample(&Vec2D{x,y}, ell)
     }
 
+    /// sample all basis functions at many x/y coordinates in a single call,
+    /// returning a `[len(x), ncoeffs]` array
+    pub fn sample_xy_batch(&self, x: Vec<f64>, y: Vec<f64>) -> Result<Vec<Vec<f64>>> {
+        check_batch_lengths(&x, &y)?;
+        Ok(
+            x.into_par_iter().zip(y)
+            .map(|(x,y)| {
+                let pos = Vec2D{x,y};
+                (0..self.coeffs.len()).map(|ell| self.sample(&pos, ell)).collect::<Vec<f64>>()
+            })
+            .collect()
+        )
+    }
+
     /// evaluate distortions (including coefficients) at x/y coordinates
     pub fn eval_xy(&self, x: f64, y: f64) -> (f64,f64) {
         let Vec2D{x,y} = self.eval(&Vec2D{x,y});
         (x,y)
     }
 
+    /// evaluate distortions (including coefficients) at many x/y coordinates
+    /// in a single call, returning a `[len(x), 2]` array
+    pub fn eval_xy_batch(&self, x: Vec<f64>, y: Vec<f64>) -> Result<Vec<(f64,f64)>> {
+        check_batch_lengths(&x, &y)?;
+        Ok(
+            x.into_par_iter().zip(y)
+            .map(|(x,y)| {
+                let Vec2D{x,y} = self.eval(&Vec2D{x,y});
+                (x,y)
+            })
+            .collect()
+        )
+    }
+
     #[getter]
     fn ncoeffs(&self) -> usize {
         self.coeffs.len()
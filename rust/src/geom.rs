@@ -109,10 +109,19 @@ impl Grid {
     }
     /// determine all possible points of pinholes for a given grid
     pub fn all_points(&self, width: usize, height: usize) -> Vec<Vec2D> {
-        let max_rad = width.max(height)*4;
         match self {
             Grid::Hex { pitch, rotation, offset } => {
-                // first make a square grid with way too many points
+                // any pinhole landing in the image is within max_dist of the
+                // grid origin, and a lattice point with index (i,j) is at least
+                // max(|i|,|j|)*pitch/2 from it, so there's no point in
+                // enumerating (8*max(width,height))^2 candidates.
+                let max_dist = (width as f64).hypot(height as f64)/2.0 + 2.0
+                    + offset.x.hypot(offset.y);
+                // (saturating, since a zero pitch gives an infinite bound)
+                let max_rad = ((2.0*max_dist/pitch.abs()).ceil() as usize)
+                    .saturating_add(1)
+                    .min(width.max(height)*4);
+                // first make a square grid with (slightly) too many points
                 (0..2*max_rad).map(|x| x as f64)
                 .flat_map(|x| (0..2*max_rad)
                     // shift it to be centered at origin
@@ -139,6 +148,13 @@ impl Grid {
             },
         }
     }
+    /// determine all possible points of pinholes for a given grid, as (x, y)
+    /// pairs (e.g., to convert directly to an [N, 2] numpy array)
+    pub fn all_points_xy(&self, width: usize, height: usize) -> Vec<(f64, f64)> {
+        self.all_points(width, height).into_iter()
+        .map(|Vec2D{x,y}| (x,y))
+        .collect()
+    }
 }
 
 /// centroid type, to be populated by centroider
@@ -5,14 +5,6 @@ use pyo3::{pyclass, pymethods};
 
 use crate::{Centroid, Grid, MavDACError, Result, Vec2D};
 
-
-#[derive(Debug, Clone)]
-struct Pixel {
-    x: usize,
-    y: usize,
-    val: f64,
-}
-
 /// Image struct, with metadata corresponding to calibration
 #[derive(Clone,Debug)]
 #[pyclass]
@@ -143,12 +135,27 @@ impl Image {
 
     /// compute centroid for image given a point and cog-radius
     pub fn cog(&self, point: &Vec2D, rad: usize) -> Centroid {
-        let (sumx,sumy,flux) = self.get_blob(&point.clone(), rad).into_iter()
-        .map(|pixel| (
-            pixel.x as f64*pixel.val,
-            pixel.y as f64*pixel.val,
-            pixel.val
-        )).fold((0.0,0.0,0.0), |a,b| (a.0+b.0, a.1+b.1, a.2+b.2));
+        let rad = rad as isize;
+        let xc = point.x as isize;
+        let yc = point.y as isize;
+        let width = self.shape[1] as isize;
+        let height = self.shape[0] as isize;
+        let (mut sumx, mut sumy, mut flux) = (0.0, 0.0, 0.0);
+        // walk the circular window one row at a time, so that each row of the
+        // window is a contiguous slice of the image
+        for y in (yc-rad).max(0)..(yc+rad+1).min(height) {
+            let half_width = row_half_width(rad, y-yc);
+            let x0 = (xc-half_width).max(0);
+            let x1 = (xc+half_width+1).min(width);
+            if x0 >= x1 {
+                continue;
+            }
+            let row = &self.data[(y*width+x0) as usize..(y*width+x1) as usize];
+            let (row_sumx, row_flux) = weighted_row_sums(row);
+            sumx += row_sumx + x0 as f64 * row_flux;
+            sumy += y as f64 * row_flux;
+            flux += row_flux;
+        }
         Centroid {
             cog: Vec2D{x: sumx / flux, y: sumy /flux},
             flux,
@@ -163,33 +170,46 @@ impl Image {
     }
 }
 
-impl Image {
-    fn get_blob(&self, pos: &Vec2D, rad: usize) -> Vec<Pixel> {
-        let rad = rad as isize;
-        let mut pixels: Vec<Pixel> = vec![];
-        let xc = pos.x as isize;
-        let yc = pos.y as isize;
-        for x in -rad..rad+1 {
-            for y in -rad..rad+1 {
-                if x.pow(2) + y.pow(2) > rad.pow(2) {
-                    continue;
-                }
-                let px = (x + xc) as usize;
-                let py = (y + yc) as usize;
-                if px >= self.shape[1] || py >= self.shape[0] {
-                    continue;
-                }
-                pixels.push(Pixel{
-                    x: px,
-                    y: py,
-                    val: self.data[py*self.shape[1]+px]
-                });
-            }
+/// largest half-width of a row of a circular window with radius `rad`, at a
+/// vertical offset of `dy` from its centre
+fn row_half_width(rad: isize, dy: isize) -> isize {
+    let r2 = rad.pow(2) - dy.pow(2);
+    let mut w = (r2 as f64).sqrt() as isize;
+    while w.pow(2) > r2 {
+        w -= 1;
+    }
+    while (w+1).pow(2) <= r2 {
+        w += 1;
+    }
+    w
+}
+
+/// sum of a row of pixels, and sum of the pixels weighted by their index in
+/// the row. Partial sums are kept in independent lanes so that the compiler
+/// is free to vectorise the loop.
+fn weighted_row_sums(row: &[f64]) -> (f64, f64) {
+    const LANES: usize = 8;
+    let mut sum = [0.0; LANES];
+    let mut sumi = [0.0; LANES];
+    let chunks = row.chunks_exact(LANES);
+    let tail = chunks.remainder();
+    for (c, chunk) in chunks.enumerate() {
+        let offset = (c*LANES) as f64;
+        for lane in 0..LANES {
+            sum[lane] += chunk[lane];
+            sumi[lane] += (offset + lane as f64) * chunk[lane];
         }
-        pixels
     }
+    let start = row.len() - tail.len();
+    let mut total: f64 = sum.iter().sum();
+    let mut totali: f64 = sumi.iter().sum();
+    for (i, val) in tail.iter().enumerate() {
+        total += val;
+        totali += (start + i) as f64 * val;
+    }
+    (totali, total)
 }
-    
+
 
 /// coordinate struct for interfacing with coordinate files
 #[derive(Debug,Clone)]
@@ -40,8 +40,10 @@ pub use crate::basis::{BiVarPolyDistortions,BiVarFourierDistortions,DistortionBa
 #[pymodule]
 fn mavdac(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(get_coordinates, m)?)?;
-    m.add_function(wrap_pyfunction!(load_images, m)?)?;
-    m.add_function(wrap_pyfunction!(measure_cogs, m)?)?;
+    m.add_function(wrap_pyfunction!(py_glob_paths, m)?)?;
+    m.add_function(wrap_pyfunction!(py_load_images, m)?)?;
+    m.add_function(wrap_pyfunction!(py_load_image_files, m)?)?;
+    m.add_function(wrap_pyfunction!(py_measure_cogs, m)?)?;
     m.add_class::<Image>()?;
     m.add_class::<Grid>()?;
     m.add_class::<Centroid>()?;
@@ -52,22 +54,71 @@ fn mavdac(m: &Bound<'_, PyModule>) -> PyResult<()> {
     Ok(())
 }
 
+/// Paths matching a glob pattern, as they would be loaded by `load_images`
+#[pyfunction]
+#[pyo3(name = "glob_paths")]
+fn py_glob_paths(pattern: &str) -> Result<Vec<PathBuf>> {
+    glob_paths(pattern)
+}
+
 /// Load images from disk given a glob pattern
 #[pyfunction]
-pub fn load_images(pattern: &str) -> Result<Vec<Image>> {
-    glob::glob(pattern)?
+#[pyo3(name = "load_images")]
+fn py_load_images(py: Python<'_>, pattern: &str) -> Result<Vec<Image>> {
+    py.allow_threads(|| load_images(pattern))
+}
+
+/// Load images from disk given a list of paths (e.g., already globbed)
+#[pyfunction]
+#[pyo3(name = "load_image_files")]
+fn py_load_image_files(py: Python<'_>, paths: Vec<PathBuf>) -> Result<Vec<Image>> {
+    py.allow_threads(|| load_image_files(paths))
+}
+
+/// measured centroids from a set of images
+#[pyfunction]
+#[pyo3(name = "measure_cogs")]
+fn py_measure_cogs<'py>(
+    py: Python<'py>, images: Vec<PyRef<'py, Image>>, grid: Grid, rad: usize,
+    fluxthresh: f64,
+) -> Vec<Vec<Centroid>> {
+    // borrow the pixel data of the python-owned images, rather than cloning
+    // every image on the way in
+    let images: Vec<&Image> = images.iter().map(|image| &**image).collect();
+    py.allow_threads(|| measure_image_cogs(&images, grid, rad, fluxthresh))
+}
+
+/// Paths matching a glob pattern, as they would be loaded by `load_images`
+pub fn glob_paths(pattern: &str) -> Result<Vec<PathBuf>> {
+    Ok(glob::glob(pattern)?
     .filter(|file| file.is_ok())
     .flatten()
-    .collect::<Vec<PathBuf>>()
-    .into_par_iter()
+    .collect::<Vec<PathBuf>>())
+}
+
+/// Load images from disk given a glob pattern
+pub fn load_images(pattern: &str) -> Result<Vec<Image>> {
+    load_image_files(glob_paths(pattern)?)
+}
+
+/// Load images from disk given a list of paths (e.g., already globbed)
+pub fn load_image_files(paths: Vec<PathBuf>) -> Result<Vec<Image>> {
+    paths.into_par_iter()
     .map(|path| Image::from_fits(path.to_str().unwrap()))
     .collect::<Result<Vec<Image>>>()
 }
 
 /// measured centroids from a set of images
-#[pyfunction]
 pub fn measure_cogs(
     images: Vec<Image>, grid: Grid, rad: usize, fluxthresh: f64
+) -> Vec<Vec<Centroid>> {
+    let images: Vec<&Image> = images.iter().collect();
+    measure_image_cogs(&images, grid, rad, fluxthresh)
+}
+
+/// measured centroids from a set of borrowed images
+pub fn measure_image_cogs(
+    images: &[&Image], grid: Grid, rad: usize, fluxthresh: f64
 ) -> Vec<Vec<Centroid>> {
     if images.is_empty() {
         return vec![];
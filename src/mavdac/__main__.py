@@ -4,8 +4,12 @@ import json
 import os
 import click
 import sys
-import glob
 import numpy
+try:
+    # faster json serialisation, if available
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
 
 parser = argparse.ArgumentParser(
     "mavdac",
@@ -46,10 +50,26 @@ parser.add_argument(
     "--degree", type=int, default=5,
     help="maximum order of bivariate polynomial used in distortion fitting"
 )
+parser.add_argument(
+    "--format", choices=["json", "csv"], default="json",
+    help="format of coefficients printed when no coordinates are given"
+)
+parser.add_argument(
+    "--debug", action="store_true",
+    help="save /tmp/sample.fits showing the centroiding regions"
+)
 
 args = parser.parse_args()
 
-if len(glob.glob(args.pattern)) == 0:
+# glob once here, and hand the matched paths to mavdac, rather than having it
+# glob the same pattern again. This uses the same (rust) glob as
+# mavdac.run_mavdac, which differs from python's glob for, e.g., dotfiles
+try:
+    paths = mavdac.mavdac.glob_paths(args.pattern)
+except ValueError:
+    # malformed pattern, which can't match any files either
+    paths = []
+if len(paths) == 0:
     print(
         f"pattern does not match any files: {args.pattern}\naborting.",
         file=sys.stderr,
@@ -70,9 +90,9 @@ if not os.path.isfile(args.grid):
     ).to_yaml(args.grid)
 
 try:
-    basis = mavdac.run_mavdac(
-        args.pattern, rad=args.radius, flux_thresh=args.thresh,
-        gridfile=args.grid, poly_degree=args.degree
+    basis = mavdac.run_mavdac_paths(
+        paths, rad=args.radius, flux_thresh=args.thresh,
+        gridfile=args.grid, poly_degree=args.degree, debug=args.debug,
     )
 except numpy.linalg.LinAlgError:
     print(
@@ -88,10 +108,24 @@ try some of the following:
 
 if args.coordinates:
     coordinates = mavdac.mavdac.get_coordinates(args.coordinates)
-    for coordinate in coordinates:
-        posx, posy = coordinate.pos
-        distx, disty = basis.eval_xy(posx, posy)
-        print(f"{posx},{posy},{distx},{disty}")
+    positions = [coordinate.pos for coordinate in coordinates]
+    # evaluate all coordinates in one call, and write them out in one go
+    dists = basis.eval_xy_batch(
+        [posx for posx, _ in positions], [posy for _, posy in positions],
+    )
+    sys.stdout.write("".join(
+        f"{posx},{posy},{distx},{disty}\n"
+        for (posx, posy), (distx, disty) in zip(positions, dists)
+    ))
 else:
     # no coordinates to eval, so lets just print the coefficients
-    print(json.dumps(basis.coeffs, indent=2))
+    if args.format == "csv":
+        # one row of x,y coefficients per basis function
+        numpy.savetxt(sys.stdout, basis.coeffs, fmt="%.15g", delimiter=",")
+    elif orjson is not None:
+        sys.stdout.buffer.write(orjson.dumps(
+            basis.coeffs,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE,
+        ))
+    else:
+        print(json.dumps(basis.coeffs, indent=2))
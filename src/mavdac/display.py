@@ -1,41 +1,57 @@
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+import numpy as np
 
 
-def plot_input(filename):
-    with open(filename, "r") as f:
-        lines = f.readlines()
-    lines = [ell for ell in lines if len(ell) > 0]
+def plot_input(filename, heads=True):
+    data = np.atleast_2d(
+        np.genfromtxt(filename, usecols=range(8), invalid_raise=False)
+    )
+    # non-numeric lines (e.g., column headers) are parsed as nan, so skip them
+    data = data[~np.isnan(data).any(axis=1)]
     fig, ax = plt.subplots(1, 1, figsize=[8, 8])
-    for line in lines:
-        try:
-            row = [float(a) for a in line.split(" ")]
-        except ValueError:
-            continue
-        x = row[0]*3600*4000/30+2000
-        y = row[1]*3600*4000/30+2000
-        dx = (row[6] - row[4])*0.736*4000/30
-        dy = (row[7] - row[5])*0.736*4000/30
-        plt.arrow(x, y, dx, dy)
-
-
-def plot_output(filename):
-    with open(filename, "r") as f:
-        lines = f.readlines()
-    lines = [ell for ell in lines if len(ell) > 0]
+    x = data[:, 0]*3600*4000/30+2000
+    y = data[:, 1]*3600*4000/30+2000
+    dx = (data[:, 6] - data[:, 4])*0.736*4000/30
+    dy = (data[:, 7] - data[:, 5])*0.736*4000/30
+    plot_arrows(ax, np.stack([x, y, dx, dy], axis=1), heads=heads)
+
+
+def plot_output(filename, heads=True):
+    arrows = np.loadtxt(filename, delimiter=",", usecols=(0, 1, 2, 3), ndmin=2)
     fig, ax = plt.subplots(1, 1, figsize=[8, 8])
-    for line in lines:
-        x, y, dx, dy = [float(a) for a in line.split(",")[:4]]
-        plt.arrow(x, y, dx, dy)
+    plot_arrows(ax, arrows, heads=heads)
+
+
+def plot_arrows(ax, arrows, heads=True):
+    """draw all arrows (rows of x, y, dx, dy) as a single quiver, rather than
+    one artist per arrow. Without heads, the arrows are drawn as a single
+    (even cheaper) collection of line segments."""
+    if not heads:
+        segments = np.stack(
+            [arrows[:, 0:2], arrows[:, 0:2]+arrows[:, 2:4]], axis=1,
+        )
+        ax.add_collection(LineCollection(segments, linewidths=0.5))
+        ax.autoscale_view()
+        return
+    ax.quiver(
+        arrows[:, 0], arrows[:, 1], arrows[:, 2], arrows[:, 3],
+        angles="xy", scale_units="xy", scale=1,
+    )
 
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("distortions")
+    parser.add_argument(
+        "--no-heads", dest="heads", action="store_false",
+        help="draw distortions as plain line segments, without arrow heads",
+    )
     args = parser.parse_args()
     suffix = args.distortions.split(".")[-1]
     if suffix == "txt":
-        plot_input(args.distortions)
+        plot_input(args.distortions, heads=args.heads)
     else:
-        plot_output(args.distortions)
+        plot_output(args.distortions, heads=args.heads)
     plt.show()
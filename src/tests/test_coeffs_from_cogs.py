@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+The purpose of this test is to check the least-squares fit in
+`coeffs_from_cogs` without simulating any images: centroids are generated
+directly from a known polynomial distortion, and the recovered distortions are
+compared against the truth, and between the direct and sketched solutions.
+"""
+import numpy as np
+from types import SimpleNamespace
+from typing import Union
+import mavdac
+
+imshape = (4000, 4000)
+
+
+def make_pos(rng: np.random.Generator, npinholes: int) -> np.ndarray:
+    """random pinhole positions, each shifted by 50 pixels @ [0 deg, 120 deg,
+    240 deg], as a [P, N, 2] array"""
+    theta = np.linspace(0, 2*np.pi, 4)[:-1]
+    shifts = 50.0*np.stack([np.cos(theta), np.sin(theta)], axis=1)
+    return rng.uniform(500, 3500, [npinholes, 1, 2]) + shifts[None, :, :]
+
+
+def make_cogs(
+    basis: mavdac.mavdac.BiVarPolyDistortions, pos: np.ndarray,
+    noise: Union[float, np.ndarray] = 0.0,
+):
+    """centroids of pinholes at `pos` ([P, N, 2] pixels) distorted by `basis`
+    plus `noise`, with the same attributes as mavdac.mavdac.Centroid"""
+    dist = np.array(basis.eval_xy_batch(
+        pos[:, :, 0].ravel(), pos[:, :, 1].ravel()
+    )).reshape(pos.shape)
+    cog = pos + dist + noise
+    return [
+        [
+            SimpleNamespace(posx=px, posy=py, cogx=cx, cogy=cy)
+            for (px, py), (cx, cy) in zip(pos_i, cog_i)
+        ]
+        for pos_i, cog_i in zip(pos, cog)
+    ]
+
+
+def test_coeffs_from_cogs() -> None:
+    rng = np.random.default_rng(1234)
+    basis_true = mavdac.mavdac.BiVarPolyDistortions(5, imshape)
+    coeffs = np.array(basis_true.coeffs)
+    basis_true.load_coeffs(rng.standard_normal(coeffs.shape))
+
+    pos = make_pos(rng, 400)
+    cogs = make_cogs(basis_true, pos)
+
+    x, y = pos[:, 0, 0], pos[:, 0, 1]
+    d_true = np.array(basis_true.eval_xy_batch(x, y))
+    basis = mavdac.mavdac.BiVarPolyDistortions(5, imshape)
+    mavdac.coeffs_from_cogs(cogs, basis)
+    d_est = np.array(basis.eval_xy_batch(x, y))
+
+    assert np.abs(d_est - d_true).max() < 1e-9
+
+
+def test_coeffs_from_cogs_sketch() -> None:
+    rng = np.random.default_rng(1234)
+    basis_true = mavdac.mavdac.BiVarPolyDistortions(5, imshape)
+    coeffs = np.array(basis_true.coeffs)
+    basis_true.load_coeffs(rng.standard_normal(coeffs.shape))
+
+    # noisy centroids, so that the sketched problem alone would be noticeably
+    # less accurate than the full one
+    pos = make_pos(rng, 2000)
+    cogs = make_cogs(basis_true, pos, 0.01*rng.standard_normal(pos.shape))
+
+    x, y = pos[:, 0, 0], pos[:, 0, 1]
+    basis = mavdac.mavdac.BiVarPolyDistortions(5, imshape)
+    mavdac.coeffs_from_cogs(cogs, basis)
+    d_full = np.array(basis.eval_xy_batch(x, y))
+    mavdac.coeffs_from_cogs(cogs, basis, sketch_size=8*basis.ncoeffs)
+    d_sketch = np.array(basis.eval_xy_batch(x, y))
+
+    assert np.abs(d_sketch - d_full).max() < 1e-6
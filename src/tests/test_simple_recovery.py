@@ -153,10 +153,7 @@ def test_mavdac() -> None:
 
     # sample distortion function at evaluation points
     d_true = dist_eval(p_eval, coeffs_true)
-    d_est = np.array([
-        basis.eval_xy(x, y)
-        for x, y in p_eval
-    ])
+    d_est = np.array(basis.eval_xy_batch(p_eval[:, 0], p_eval[:, 1]))
     err = ((d_true - d_est).std(axis=0)**2).mean()**0.5
     assert err < 1e-4
 
@@ -3,51 +3,67 @@ import numpy as np
 import tempfile
 import pytest
 import os
+import shutil
 import subprocess
-from typing import Callable, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable
 import mavdac
-from scipy.interpolate import LinearNDInterpolator  # type: ignore
+from scipy.interpolate import (  # type: ignore
+    LinearNDInterpolator, RegularGridInterpolator,
+)
 psfs_file = "./src/tests/test_psf_gauss.fits"
 gridfile = "./src/tests/grid.yaml"
 mavis_dists = "./src/tests/mavis_dists.txt"
 imshape = (4000, 4000)
+NIMAGES: int = 3  # number of shifted images per calibration
+# images are written by mavisim and read straight back by mavdac, so keep
+# them in memory (tmpfs) where available rather than on disk. Each image is
+# up to 8 bytes per pixel, and /dev/shm can be small (e.g., 64 MB in docker),
+# so only use it if there's room for all of them, plus one for margin.
+IMAGE_TMPDIR = None
+if os.path.isdir("/dev/shm") and (
+    shutil.disk_usage("/dev/shm").free > (NIMAGES+1)*8*imshape[0]*imshape[1]
+):
+    IMAGE_TMPDIR = "/dev/shm"
 
 
-def make_eval_points(n: int = 40, r: float = 15) -> List[Tuple[float, float]]:
-    yy, xx = np.meshgrid(
-        *[np.linspace(-r, r, n)]*2,
-        indexing="ij",
-    )
-    xx = xx.flatten()
-    yy = yy.flatten()
-    rr = (xx**2 + yy**2)**0.5
-    xx = xx[rr < r]
-    yy = yy[rr < r]
-    xx = xx*4000/30+2000
-    yy = yy*4000/30+2000
-    return list(zip(xx, yy))
+def make_eval_points(n: int = 40, r: float = 15) -> np.ndarray:
+    """points on an n x n grid spanning [-r, r] arcsec that are within r of
+    the centre, returned as an [N, 2] array of pixel coordinates"""
+    ax = np.linspace(-r, r, n)
+    yy, xx = np.meshgrid(ax, ax, indexing="ij")
+    inside = xx*xx + yy*yy < r*r
+    p = np.stack([xx[inside], yy[inside]], axis=1)
+    p *= 4000/30
+    p += 2000
+    return p
 
 
 def generate_image_mavisim_cli(
     shift_x: float, shift_y: float, *, dist_pixels: Callable,
-    pinholes: List[Tuple[float, float]], filename: str
+    pinholes: np.ndarray, filename: str
 ) -> None:
     """generate an image of the calibration source with some shift in x and y
     returning the name of the file"""
-    xx_pixels, yy_pixels = np.array(pinholes).T
-    xx_pixels += shift_x
-    yy_pixels += shift_y
-    d_pixels = dist_pixels(np.array([xx_pixels, yy_pixels]).T)
-    xx_pixels += d_pixels[:, 0]
-    yy_pixels += d_pixels[:, 1]
-    xx_as = (xx_pixels * 30/imshape[0])-30/2
-    yy_as = (yy_pixels * 30/imshape[0])-30/2
+    # [N, 2] copy of the pinholes, which is transformed in place from nominal
+    # pixel positions to distorted positions in arcsec
+    xy = np.array(pinholes, dtype=np.float64)
+    xy += [shift_x, shift_y]
+    xy += dist_pixels(xy)
+    xy *= 30/imshape[0]
+    xy -= 30/2
+    xx_as, yy_as = xy.T
     header = f"--header={{\"xshift\":{shift_x},\"yshift\":{shift_y}}}"
     with tempfile.NamedTemporaryFile("w") as f:
-        f.write("Star RA Dec X PM_X Y PM_Y Flux\n")
-        for i, star in enumerate(zip(xx_as, yy_as)):
-            flux = 1e5 if xx_as[i]**2+yy_as[i]**2 <= 13**2 else 1.0
-            f.write(f"{i} 0.0 0.0 {xx_as[i]} 0.0 {yy_as[i]} 0.0 {flux}\n")
+        flux = np.where(xx_as**2+yy_as**2 <= 13**2, 1e5, 1.0)
+        np.savetxt(
+            f, np.column_stack([np.arange(len(xx_as)), xx_as, yy_as, flux]),
+            fmt="%d 0.0 0.0 %.17g 0.0 %.17g 0.0 %.1f",
+            header="Star RA Dec X PM_X Y PM_Y Flux", comments="",
+        )
+        # make sure the whole catalog is on disk before mavisim reads it
+        f.flush()
         result = subprocess.run([
             "mavisim",
             f"-o={filename}",
@@ -62,22 +78,20 @@ def generate_image_mavisim_cli(
             )
 
 
-def grid_perfect() -> List[Tuple[float, float]]:
+def grid_perfect() -> np.ndarray:
     return grid_perturbed(0.0)
 
 
-def grid_perturbed(std: float) -> List[Tuple[float, float]]:
+def grid_perturbed(std: float) -> np.ndarray:
     grid = mavdac.mavdac.Grid(gridfile)
-    points = grid.all_points(*imshape)
-    np.random.seed(1234)
-    return [(
-        point.x + std*np.random.randn(),
-        point.y + std*np.random.randn(),
-        ) for point in points]
+    points = np.array(grid.all_points_xy(*imshape)).reshape([-1, 2])
+    rng = np.random.default_rng(1234)
+    points += std*rng.standard_normal(points.shape)
+    return points
 
 
-def grid_scaled(std: float, scale: float) -> List[Tuple[float, float]]:
-    return [(x*scale, y*scale) for (x, y) in grid_perturbed(std)]
+def grid_scaled(std: float, scale: float) -> np.ndarray:
+    return grid_perturbed(std)*scale
 
 
 def dists_none(p: np.ndarray) -> np.ndarray:
@@ -85,14 +99,12 @@ def dists_none(p: np.ndarray) -> np.ndarray:
 
 
 def dists_poly(p: np.ndarray) -> np.ndarray:
-    np.random.seed(1234)
+    # local generator, since this may be called from several threads
+    rng = np.random.default_rng(1234)
     poly = mavdac.mavdac.BiVarPolyDistortions(3, imshape)
     coeffs = np.array(poly.coeffs)
-    poly.load_coeffs(1.0*np.random.randn(*coeffs.shape))
-    return np.array([
-        poly.eval_xy(x, y)
-        for x, y in p
-    ])
+    poly.load_coeffs(1.0*rng.standard_normal(coeffs.shape))
+    return np.array(poly.eval_xy_batch(p[:, 0], p[:, 1]))
 
 
 def dists_mavis(p: np.ndarray) -> np.ndarray:
@@ -100,31 +112,32 @@ def dists_mavis(p: np.ndarray) -> np.ndarray:
     return dist_func(p)
 
 
+@lru_cache(maxsize=None)
 def load_dists_from_file(file: str) -> Callable:
-    with open(file) as f:
-        lines = f.readlines()
+    # cached, so the interpolator is only built once per file, rather than
+    # every time the distortions are sampled
     platescale = 0.736  # "/mm
     pixelsize = 7.5e-3  # "/pixel
     scale = platescale/pixelsize
-    pos = []
-    dist = []
-    for line in lines:
-        s = line.split()
-        try:
-            float(s[0])
-        except ValueError:
-            continue
-        pos.append((
-            float(s[4]), float(s[5]),
-        ))
-        dist.append((
-            float(s[6])-float(s[4]), float(s[7])-float(s[5]),
-        ))
-    dist_func = LinearNDInterpolator(
-        np.array(pos)*scale+imshape[0]/2,
-        np.array(dist)*scale,
-        fill_value=0.0,
-    )
+    # predicted and real positions (in mm), non-numeric lines (e.g., column
+    # headers) are parsed as nan and skipped
+    data = np.genfromtxt(file, usecols=(4, 5, 6, 7), invalid_raise=False)
+    data = data[~np.isnan(data).any(axis=1)]
+    dist = (data[:, 2:] - data[:, :2])*scale
+    pos = data[:, :2]*scale
+    pos += imshape[0]/2
+    # if the samples form a complete rectangular grid, interpolate on that grid
+    # directly, which is much cheaper than triangulating scattered points
+    xs, ix = np.unique(pos[:, 0], return_inverse=True)
+    ys, iy = np.unique(pos[:, 1], return_inverse=True)
+    if len(xs)*len(ys) == len(pos):
+        dist_grid = np.full([len(xs), len(ys), 2], np.nan)
+        dist_grid[ix, iy] = dist
+        if not np.isnan(dist_grid).any():
+            return RegularGridInterpolator(
+                (xs, ys), dist_grid, bounds_error=False, fill_value=0.0,
+            )
+    dist_func = LinearNDInterpolator(pos, dist, fill_value=0.0)
     return dist_func
 
 
@@ -140,38 +153,47 @@ distortions = [
 ]
 
 
+@pytest.fixture(scope="session")
+def p_eval() -> np.ndarray:
+    """points to compare true and recovered distortions at, shared between all
+    parametrized tests"""
+    return make_eval_points(40, 13.0)
+
+
 @pytest.mark.parametrize("pinholes", pinholes)
 @pytest.mark.parametrize("distortions", distortions)
 def test_mavdac_cli(
-    pinholes: List[Tuple[float, float]], distortions: Callable,
-    plot: bool = False,
+    pinholes: np.ndarray, distortions: Callable,
+    p_eval: np.ndarray, plot: bool = False,
 ) -> None:
     """run the pipeline described in the docstring of this file"""
-    p_eval = np.array(make_eval_points(40, 13.0))
     SHIFT_RAD: float = 50.0  # pixels
-    NIMAGES: int = 3
     shifts = []
     for theta in np.linspace(0, 2*np.pi, NIMAGES+1)[:-1]:
         shifts.append([SHIFT_RAD*np.cos(theta), SHIFT_RAD*np.sin(theta)])
 
-    with tempfile.TemporaryDirectory() as d:
-        # create images
-        i = 0
-        for shift_x, shift_y in shifts:
-            image_filename = os.path.join(d, f"img_{i:03d}.fits")
-            generate_image_mavisim_cli(
-                shift_x=shift_x, shift_y=shift_y,
-                dist_pixels=distortions,
-                filename=image_filename, pinholes=pinholes,
-            )
-            i += 1
+    with tempfile.TemporaryDirectory(dir=IMAGE_TMPDIR) as d:
+        # create images, concurrently since each is an independent mavisim
+        # subprocess
+        with ThreadPoolExecutor(
+            max_workers=min(NIMAGES, os.cpu_count() or 1)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    generate_image_mavisim_cli,
+                    shift_x=shift_x, shift_y=shift_y,
+                    dist_pixels=distortions,
+                    filename=os.path.join(d, f"img_{i:03d}.fits"),
+                    pinholes=pinholes,
+                )
+                for i, (shift_x, shift_y) in enumerate(shifts)
+            ]
+            for future in futures:
+                future.result()
 
         # create coords
         coord_path = os.path.join(d, "coords.txt")
-        with open(coord_path, "w") as f:
-            for x, y in p_eval:
-                a = f"{x:},{y},\n"
-                f.write(a)
+        np.savetxt(coord_path, p_eval, fmt="%.17g,%.17g,")
 
         # run mavdac
         recov_path = os.path.join(d, "recov.txt")
@@ -185,13 +207,9 @@ def test_mavdac_cli(
                 "--thresh=10000",
                 "--degree=20",
             ], stdout=f)
-        with open(recov_path, "r") as f:
-            recov_lines = f.readlines()
-        recov_lines = [line for line in recov_lines if len(line) > 0]
-        d_est = np.zeros([len(recov_lines), 2])
-        for ell, line in enumerate(recov_lines):
-            d_est[ell] = [float(val) for val in line.split(",")[2:4]]
-        d_est = np.array(d_est, dtype=np.float64)
+        d_est = np.loadtxt(
+            recov_path, delimiter=",", usecols=(2, 3), ndmin=2,
+        )
 
     def rms(dists):
         return (dists.std(axis=0)**2).mean()**0.5
@@ -213,15 +231,19 @@ def test_mavdac_cli(
         p_eval[:, 1],
         p_eval[:, 0]*0+1
     ]).T
-    ps_filt = np.eye(coord_mat.shape[0]) - \
-        coord_mat @ np.linalg.solve(coord_mat.T @ coord_mat, coord_mat.T)
+    # project out the span of coord_mat using its (thin) QR decomposition,
+    # rather than building the dense N x N projection matrix
+    q, _ = np.linalg.qr(coord_mat)
+
+    def ps_filt(dists):
+        return dists - q @ (q.T @ dists)
+
     print("tt-ps-removed rms")
-    print(f"input dist: {rms(ps_filt @ d_true)} pixels rms")
-    print(f"  est dist: {rms(ps_filt @ d_est)} pixels rms")
-    d_err = ps_filt @ (d_true - d_est)
+    print(f"input dist: {rms(ps_filt(d_true))} pixels rms")
+    print(f"  est dist: {rms(ps_filt(d_est))} pixels rms")
+    d_err = ps_filt(d_true - d_est)
     err = rms(d_err)
     print(f"     error: {err} pixels rms")
-    rms(d_true - d_est)
     if plot:
         sf = 100.0
         for i in range(len(p_eval)):
@@ -254,7 +276,8 @@ if __name__ == "__main__":
         for pinhole in pinholes:
             plt.figure(figsize=(12, 8))
             test_mavdac_cli(
-                distortions=distortion, pinholes=pinhole, plot=True,
+                distortions=distortion, pinholes=pinhole,
+                p_eval=make_eval_points(40, 13.0), plot=True,
             )
             plt.subplot(1, 2, 1)
             plt.axis("square")